@@ -10,3 +10,62 @@ CREATE TABLE IF NOT EXISTS items (
     image_name TEXT NOT NULL,
     FOREIGN KEY (category_id) REFERENCES categories(id)
 );
+
+-- Item names are unique. The constraint is an index rather than part of the
+-- column so databases created before it existed get it too, and new ones do
+-- not carry a second, identical autoindex
+CREATE UNIQUE INDEX IF NOT EXISTS idx_items_name ON items(name);
+
+-- No query filters items by category, so an index on category_id would only
+-- cost writes. Categories are never deleted, so the foreign key needs none
+DROP INDEX IF EXISTS idx_items_category_id;
+
+-- Lets delete/update count the items still sharing an image without a scan
+CREATE INDEX IF NOT EXISTS idx_items_image_name ON items(image_name);
+
+-- Bumped by triggers on every change to items. Each worker process compares it
+-- with the version its cached responses were built from.
+CREATE TABLE IF NOT EXISTS items_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO items_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS items_version_insert AFTER INSERT ON items BEGIN
+    UPDATE items_version SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_version_delete AFTER DELETE ON items BEGIN
+    UPDATE items_version SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_version_update AFTER UPDATE ON items BEGIN
+    UPDATE items_version SET version = version + 1;
+END;
+
+-- Full-text index for /search. The trigram tokenizer matches any substring of
+-- three or more characters, the same results as LIKE '%keyword%' without a scan.
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(name, category_name, tokenize = 'trigram');
+
+CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts (rowid, name, category_name)
+    VALUES (new.id, new.name, (SELECT name FROM categories WHERE id = new.category_id));
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+    DELETE FROM items_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF name, category_id ON items BEGIN
+    DELETE FROM items_fts WHERE rowid = old.id;
+    INSERT INTO items_fts (rowid, name, category_name)
+    VALUES (new.id, new.name, (SELECT name FROM categories WHERE id = new.category_id));
+END;
+
+-- Index items that were stored before items_fts existed
+INSERT INTO items_fts (rowid, name, category_name)
+SELECT items.id, items.name, categories.name
+FROM items
+JOIN categories ON items.category_id = categories.id
+WHERE items.id NOT IN (SELECT rowid FROM items_fts);
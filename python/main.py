@@ -1,57 +1,317 @@
 import os
 import logging
 import pathlib
-from fastapi import FastAPI, Form, HTTPException, Depends, File, UploadFile, Query
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Form, HTTPException, Depends, File, UploadFile, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 import sqlite3
-from pydantic import BaseModel, Field
-from typing import Optional
-from contextlib import asynccontextmanager
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Final, Optional
+from contextlib import asynccontextmanager, contextmanager
+import functools
 import hashlib
+import re
+import asyncio
+import threading
+import time
+import orjson
+import anyio.to_thread
+import aiofiles
+import aiofiles.os
+import aiofiles.tempfile
 
 
 # Define the path to the images & sqlite3 database
 images = pathlib.Path(__file__).parent.resolve() / "images"
+# Handlers build image paths with os.path.join on this string instead of
+# creating a new pathlib.Path per request
+IMAGES_DIR = str(images)
 db = pathlib.Path(__file__).parent.resolve() / "db" / "mercari.sqlite3"
 SQL_DB = pathlib.Path(__file__).parent.resolve() / "db" / "items.sql"
 
 # Maximum file size (in bytes)
 MAX_FILE_SIZE = 1024 * 1024  # 1MB (easier to find a picture to test)
+# Accepted upload extensions, compared case-insensitively
+JPG_EXTENSIONS = frozenset({".jpg", ".jpeg"})
+# Uploads are hashed and written in chunks of this size; large chunks keep
+# the time spent inside OpenSSL's sha256 (which releases the GIL) high
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Uploads in flight are hidden files in the images directory until renamed
+UPLOAD_TMP_PREFIX = ".upload-"
+# Temporary uploads older than this (in seconds) are left over from a crash;
+# younger ones may still be in flight in another worker process
+STALE_UPLOAD_AGE = 3600
+
+# Stored images are named <sha256 hex>.jpg. Only such names may be stored on
+# items or removed from disk
+STORED_IMAGE_NAME_RE = re.compile(r"[0-9a-f]{64}\.jpg")
+# Names get_image will look up: stored images plus the bundled default.jpg.
+# Anything else (including "..") is rejected up front
+IMAGE_NAME_RE = re.compile(r"(?:[0-9a-f]{64}|default)\.jpg")
+
+# Stored images never change, so clients may cache them indefinitely
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# The real image may be uploaded later, so the default.jpg fallback is cached
+# only briefly
+DEFAULT_IMAGE_CACHE_CONTROL = "public, max-age=60"
+# When the app runs behind nginx, set IMAGE_ACCEL_REDIRECT to an internal
+# location aliased to the images directory (e.g. "/internal_images/") and
+# nginx will send stored images itself
+IMAGE_ACCEL_REDIRECT = os.environ.get("IMAGE_ACCEL_REDIRECT", "")
+
+# Connection tuning: WAL lets readers and the writer run concurrently, and
+# synchronous=NORMAL only fsyncs at checkpoints instead of on every commit
+SQLITE_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA busy_timeout=5000;
+PRAGMA cache_size=-20000;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+PRAGMA foreign_keys=ON;
+"""
+
+# SQL used by the handlers. Keeping each statement as one module-level string
+# lets sqlite3's per-connection statement cache reuse the compiled program.
+SQL_UPSERT_CATEGORY: Final[str] = """
+    INSERT INTO categories (name) VALUES (?)
+    ON CONFLICT(name) DO UPDATE SET name = excluded.name
+    RETURNING id
+"""
+SQL_INSERT_CATEGORY: Final[str] = "INSERT INTO categories (name) VALUES (?) ON CONFLICT(name) DO NOTHING"
+# Takes a JSON array of names so the statement text is the same for any batch size
+SQL_GET_CATEGORY_IDS: Final[str] = "SELECT name, id FROM categories WHERE name IN (SELECT value FROM json_each(?))"
+SQL_INSERT_ITEM: Final[str] = "INSERT INTO items (name, category_id, image_name) VALUES (?, ?, ?)"
+# Returns no row when an item with the same name already exists
+SQL_INSERT_NEW_ITEM: Final[str] = SQL_INSERT_ITEM + " ON CONFLICT(name) DO NOTHING RETURNING id"
+SQL_GET_ITEMS: Final[str] = """
+    SELECT items.id, items.name, categories.name AS category_name, items.image_name
+    FROM items
+    JOIN categories ON items.category_id = categories.id
+"""
+SQL_GET_ITEM: Final[str] = SQL_GET_ITEMS + "WHERE items.id = ?"
+SQL_GET_ITEMS_PAGE: Final[str] = SQL_GET_ITEMS + "ORDER BY items.id LIMIT ? OFFSET ?"
+SQL_SEARCH_ITEMS: Final[str] = """
+    SELECT items.name, categories.name AS category_name, items.image_name
+    FROM items_fts
+    JOIN items ON items.id = items_fts.rowid
+    JOIN categories ON items.category_id = categories.id
+    WHERE items_fts MATCH ?
+"""
+# The trigram index cannot answer keywords shorter than three characters
+SQL_SEARCH_ITEMS_SHORT: Final[str] = """
+    SELECT items.name, categories.name AS category_name, items.image_name
+    FROM items
+    JOIN categories ON items.category_id = categories.id
+    WHERE items.name LIKE ? OR categories.name LIKE ?
+"""
+SQL_GET_IMAGE_NAME: Final[str] = "SELECT image_name FROM items WHERE id = ?"
+SQL_DELETE_ITEM: Final[str] = "DELETE FROM items WHERE id = ?"
+SQL_COUNT_IMAGE_REFS: Final[str] = "SELECT COUNT(*) FROM items WHERE image_name = ?"
+SQL_GET_ITEMS_VERSION: Final[str] = "SELECT version FROM items_version"
+SQL_HAS_ITEMS_TABLE: Final[str] = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items'"
+SQL_FIND_DUPLICATE_NAMES: Final[str] = """
+    SELECT name, group_concat(id, ', ') FROM items
+    GROUP BY name HAVING COUNT(*) > 1
+"""
+
+# Reads are served from a pool of long-lived connections so SQLite's page
+# cache stays warm across requests; writes go through a single connection
+# so a worker's writers never contend with each other for the database lock
+READ_POOL_SIZE = os.cpu_count() or 4
+WRITE_POOL_SIZE = 1
+# Sync handlers run in anyio's thread pool (40 threads by default); raise the
+# limit so slow disk or DB work cannot starve requests
+THREAD_LIMIT = 100
+
+# The pools are asyncio queues: a request waiting for a connection waits on
+# the event loop instead of holding one of the threads that the requests
+# already holding a connection need in order to finish
+read_pool: Optional[asyncio.Queue] = None
+write_pool: Optional[asyncio.Queue] = None
+
+
+def connect_db() -> sqlite3.Connection:
+    # isolation_level=None leaves transactions to write_transaction(); reads
+    # run in autocommit mode
+    conn = sqlite3.connect(db, check_same_thread=False, cached_statements=256, isolation_level=None)
+    conn.executescript(SQLITE_PRAGMAS)
+    # Rows stay plain tuples; handlers build their response dicts directly
+    return conn
+
+
+def open_pool(size: int) -> asyncio.Queue:
+    pool = asyncio.Queue(maxsize=size)
+    for _ in range(size):
+        pool.put_nowait(connect_db())
+    return pool
+
+
+def close_pool(pool: asyncio.Queue):
+    while not pool.empty():
+        pool.get_nowait().close()
 
-def get_db():
-    if not db.exists():
-        setup_database()
 
-    conn = sqlite3.connect(db, check_same_thread=False)
-    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+@asynccontextmanager
+async def pooled_connection(pool: asyncio.Queue):
+    conn = await pool.get()
     try:
         yield conn
     finally:
-        conn.close()
+        # Never hand out a connection still inside a transaction; every later
+        # BEGIN on it would fail
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        pool.put_nowait(conn)
+
+
+async def get_db():
+    async with pooled_connection(read_pool) as conn:
+        yield conn
+
+
+async def get_write_db():
+    async with pooled_connection(write_pool) as conn:
+        yield conn
+
+
+@contextmanager
+def write_transaction(conn: sqlite3.Connection):
+    # BEGIN IMMEDIATE takes the write lock up front, so a writer never has to
+    # upgrade a read lock halfway through and fail with SQLITE_BUSY
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+        conn.execute("COMMIT")
+    except BaseException:
+        # Also reached when COMMIT itself fails (busy, I/O error, disk full)
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+
+# Read endpoints keep their results in memory until the next write.
+# items_cache holds the serialized GET /items body and its ETag; item_cache
+# maps item ids to GET /items/{item_id} results. cache_generation is bumped
+# on every invalidation so a read that raced with a write does not store
+# its (possibly stale) result.
+ITEM_CACHE_SIZE = 1024
+# Upper bound for GET /items?limit=
+MAX_PAGE_SIZE = 1000
+
+# Category name -> id. Categories are never renamed or deleted, so an id
+# stays valid once its transaction has committed and needs no invalidation.
+category_ids: dict[str, int] = {}
+
+items_cache: Optional[tuple[bytes, str]] = None
+item_cache: dict[int, dict] = {}
+cache_generation = 0
+cache_lock = threading.Lock()
+# Last items_version seen in the database (see check_items_version)
+items_version: Optional[int] = None
+
+
+def invalidate_item_caches():
+    global items_cache, cache_generation
+    with cache_lock:
+        cache_generation += 1
+        items_cache = None
+        item_cache.clear()
+
+
+def check_items_version(db: sqlite3.Connection):
+    # Other worker processes write to the same database. Triggers bump
+    # items_version on every change to items, so a version this process has
+    # not seen yet means its cached responses may be stale
+    global items_version
+    version = db.execute(SQL_GET_ITEMS_VERSION).fetchone()[0]
+    if version != items_version:
+        invalidate_item_caches()
+        items_version = version
+
+
+def remove_stale_uploads():
+    # Uploads interrupted by a crash leave their temporary file behind
+    cutoff = time.time() - STALE_UPLOAD_AGE
+    for entry in os.scandir(IMAGES_DIR):
+        if not entry.name.startswith(UPLOAD_TMP_PREFIX):
+            continue
+        # Every worker runs this sweep at startup; another one may have
+        # removed the file first
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                logger.info("Removed stale upload: %s", entry.path)
+        except FileNotFoundError:
+            continue
+
+
+def check_duplicate_item_names(conn: sqlite3.Connection):
+    # Before items.name was UNIQUE, PATCH /items/{id} could rename an item to a
+    # name already in use. items.sql cannot add the unique index over such
+    # rows, so report which items need renaming instead of failing on it
+    if conn.execute(SQL_HAS_ITEMS_TABLE).fetchone() is None:
+        return
+    duplicates = conn.execute(SQL_FIND_DUPLICATE_NAMES).fetchall()
+    if duplicates:
+        details = "; ".join(f"{name!r} (ids {ids})" for name, ids in duplicates)
+        raise RuntimeError(f"Item names must be unique, rename or delete the duplicates: {details}")
 
 
 # STEP 5-1: set up the database connection
 def setup_database():
     conn = sqlite3.connect(db)
-    with open(SQL_DB, "r", encoding="utf-8") as f:
-        conn.executescript(f.read())
-    conn.commit()
-    conn.close()
+    try:
+        conn.executescript(SQLITE_PRAGMAS)
+        check_duplicate_item_names(conn)
+        with open(SQL_DB, "r", encoding="utf-8") as f:
+            conn.executescript(f.read())
+        conn.commit()
+    finally:
+        conn.close()
     logger.info("Database initialized successfully.")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global read_pool, write_pool
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREAD_LIMIT
     setup_database()
+    remove_stale_uploads()
+    read_pool = open_pool(READ_POOL_SIZE)
+    write_pool = open_pool(WRITE_POOL_SIZE)
     yield
+    close_pool(read_pool)
+    close_pool(write_pool)
+
+
+@functools.cache
+def default_image_bytes() -> bytes:
+    # default.jpg is served from memory whenever a requested image is missing;
+    # it is read on first use so a missing file cannot break startup
+    with open(os.path.join(IMAGES_DIR, "default.jpg"), "rb") as f:
+        return f.read()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match may list several tags, use weak W/ tags or be "*"
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 logger = logging.getLogger("uvicorn")
 logger.level = logging.DEBUG
-images = pathlib.Path(__file__).parent.resolve() / "images"
 origins = [os.environ.get("FRONT_URL", "http://localhost:3000")]
 app.add_middleware(
     CORSMiddleware,
@@ -62,78 +322,138 @@ app.add_middleware(
 )
 
 
+# Read handlers do not catch database errors themselves
+@app.exception_handler(sqlite3.Error)
+async def sqlite_error_handler(request: Request, exc: sqlite3.Error):
+    logger.exception("Database error on %s %s", request.method, request.url.path, exc_info=exc)
+    return ORJSONResponse(status_code=500, content={"detail": "Database error"})
+
+
 class HelloResponse(BaseModel):
     message: str
 
 
-@app.get("/", response_model=HelloResponse)
-def hello():
-    return HelloResponse(**{"message": "Hello, world!"})
+# The hello body never changes, so it is serialized once at import
+HELLO_BYTES = orjson.dumps({"message": "Hello, world!"})
+
+
+# Small fixed responses skip response_model validation; the models are only
+# referenced for the OpenAPI schema
+@app.get("/", responses={200: {"model": HelloResponse}})
+async def hello():
+    return Response(content=HELLO_BYTES, media_type="application/json")
 
 
 class AddItemResponse(BaseModel):
     message: str
 
 
+async def save_image(image: UploadFile) -> str:
+    # Hash and write the upload in a single streaming pass, then move it to
+    # <sha256>.jpg; an identical image that is already stored is reused as is
+    hasher = hashlib.sha256()
+    size = 0
+    tmp_name = None
+    try:
+        async with aiofiles.tempfile.NamedTemporaryFile(
+            "wb", dir=IMAGES_DIR, prefix=UPLOAD_TMP_PREFIX, delete=False
+        ) as tmp:
+            tmp_name = tmp.name
+            while chunk := await image.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_FILE_SIZE:
+                    raise HTTPException(status_code=400, detail="File size exceeds the limit")
+                hasher.update(chunk)
+                await tmp.write(chunk)
+
+        image_filename = f"{hasher.hexdigest()}.jpg"
+        image_path = os.path.join(IMAGES_DIR, image_filename)
+        if not await aiofiles.os.path.exists(image_path):
+            os.chmod(tmp_name, 0o644)
+            await aiofiles.os.replace(tmp_name, image_path)
+            logger.info("New image saved: %s", image_path)
+    finally:
+        if tmp_name is not None and await aiofiles.os.path.exists(tmp_name):
+            await aiofiles.os.remove(tmp_name)
+
+    return image_filename
+
+
 # add_item is a handler to add a new item for POST /items .
-@app.post("/items", response_model=AddItemResponse)
+@app.post("/items", responses={200: {"model": AddItemResponse}})
 async def add_item(
     name: str = Form(...),
     category: str = Form(...),
     image: UploadFile = File(...),
-    db: sqlite3.Connection = Depends(get_db)
 ):
     if not name or not category or not image:
         raise HTTPException(status_code=400, detail="name, category, and image are required")
 
     # Check file extension (when POST)
-    if not image.filename.lower().endswith((".jpg", ".jpeg")):
+    if os.path.splitext(image.filename)[1].lower() not in JPG_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Uploaded file must have a .jpg or .jpeg extension")
 
-    # Check file size
-    image_bytes = await image.read()
-    if len(image_bytes) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File size exceeds the limit")
-
     # Validate MIME type
     image_type = image.content_type
     if image_type != "image/jpeg":
         raise HTTPException(status_code=400, detail="Uploaded file is not a valid JPG image")
-    
-    # Generate unique filename
-    image_hash = hashlib.sha256(image_bytes).hexdigest()
-    image_filename = f"{image_hash}.jpg"
-    image_path = images / image_filename
-    
-    # Save file
-    with open(image_path, "wb") as f:
-        f.write(image_bytes)
-    
-    # Store item in database
-    item = Item(name=name, category=category, image_name=image_filename)
-    insert_item(item, db)
+
+    # Save file under its content hash
+    image_filename = await save_image(image)
+
+    # Store item in database. The write connection is only taken once the
+    # upload is on disk, so a slow client does not block other writers
+    async with pooled_connection(write_pool) as db:
+        await run_in_threadpool(insert_item, name, category, image_filename, db)
+    invalidate_item_caches()
     
     return {"message": f"item received: {name}"}
 
 
 # get_image is a handler to return an image for GET /images/{filename} .
 @app.get("/images/{image_name}")
-async def get_image(image_name):
+async def get_image(image_name: str, request: Request):
+    # Check file name (when GET)
+    if not IMAGE_NAME_RE.fullmatch(image_name):
+        raise HTTPException(status_code=400, detail="Invalid image name")
+
     # Create image path
-    image = images / image_name
+    image = os.path.join(IMAGES_DIR, image_name)
 
-    # Check file extension (when GET)
-    if not image_name.endswith(".jpg"):
-        raise HTTPException(status_code=400, detail="Image path does not end with .jpg")
+    # One stat answers whether the image exists and is handed to FileResponse,
+    # which would otherwise stat the file again
+    try:
+        stat_result = os.stat(image)
+    except FileNotFoundError:
+        logger.debug("Image not found: %s", image)
+        return Response(
+            content=default_image_bytes(),
+            media_type="image/jpeg",
+            headers={"Cache-Control": DEFAULT_IMAGE_CACHE_CONTROL},
+        )
 
-    if not image.exists():
-        logger.debug(f"Image not found: {image}")
-        image = images / "default.jpg"
+    if STORED_IMAGE_NAME_RE.fullmatch(image_name):
+        # Stored images are named by their content hash, so they never change
+        # and the name itself is a strong validator
+        etag = f'"{image_name[:-len(".jpg")]}"'
+        headers = {"Cache-Control": IMAGE_CACHE_CONTROL, "ETag": etag}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+    else:
+        # default.jpg may change between releases; FileResponse derives its
+        # ETag and Last-Modified from the file itself
+        headers = {"Cache-Control": DEFAULT_IMAGE_CACHE_CONTROL}
 
-    return FileResponse(image)
+    if IMAGE_ACCEL_REDIRECT:
+        headers["X-Accel-Redirect"] = IMAGE_ACCEL_REDIRECT + image_name
+        return Response(media_type="image/jpeg", headers=headers)
+
+    return FileResponse(image, headers=headers, stat_result=stat_result)
 
 
 class Item(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     id: Optional[int] = Field(None, description="Auto-generated ID")
     name: str
     category: str
@@ -141,230 +461,281 @@ class Item(BaseModel):
     category_name: Optional[str] = Field(None, description="Category name from categories table")
 
 
-def insert_item(item: Item, db: sqlite3.Connection):
+def remove_unreferenced_image(db: sqlite3.Connection, image_name: str):
+    # Only ever delete stored images, whatever name ended up in the database
+    if not STORED_IMAGE_NAME_RE.fullmatch(image_name):
+        return
+    if db.execute(SQL_COUNT_IMAGE_REFS, (image_name,)).fetchone()[0] == 0:
+        image_path = os.path.join(IMAGES_DIR, image_name)
+        if os.path.exists(image_path):
+            os.remove(image_path)
+
+
+def get_category_id(db: sqlite3.Connection, name: str) -> int:
+    # Must run inside a write transaction; the caller records the id in
+    # category_ids only once that transaction has committed
+    category_id = category_ids.get(name)
+    if category_id is None:
+        category_id = db.execute(SQL_UPSERT_CATEGORY, (name,)).fetchone()[0]
+    return category_id
+
+
+def insert_item(name: str, category: str, image_name: str, db: sqlite3.Connection):
     # STEP 4-1: add an implementation to store an item
+    # The UNIQUE index on items.name doubles as the existence check; leaving the
+    # transaction with an exception also rolls back a newly created category
     try:
-        cursor = db.cursor()
-        cursor.execute("SELECT id FROM categories WHERE name = ?", (item.category,))
-        category_row = cursor.fetchone()
-        
-        if category_row is None:
-            cursor.execute("INSERT INTO categories (name) VALUES (?)", (item.category,))
-            db.commit()  
-            category_id = cursor.lastrowid
-        else:
-            category_id = category_row["id"]
-
-        cursor.execute("SELECT id FROM items WHERE name = ?", (item.name,))
-        existing_item = cursor.fetchone()
-
-        if existing_item:
-            logger.info(f"Item already exists: {existing_item}")
-            raise HTTPException(status_code=400, detail="Item already exists")
-
-        cursor.execute(
-            "INSERT INTO items (name, category_id, image_name) VALUES (?, ?, ?)",
-            (item.name, category_id, item.image_name),
-        )
-        db.commit()
-        logger.info(f"New item inserted: {item.model_dump()}")
+        with write_transaction(db):
+            category_id = get_category_id(db, category)
+            if db.execute(SQL_INSERT_NEW_ITEM, (name, category_id, image_name)).fetchone() is None:
+                logger.info("Item already exists: %s", name)
+                raise HTTPException(status_code=400, detail="Item already exists")
 
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to save item: {e}")
-        raise HTTPException(status_code=500, detail="Failed to save item")
+        category_ids[category] = category_id
+        logger.info("New item inserted: %s (%s, %s)", name, category, image_name)
 
+    except sqlite3.Error:
+        logger.exception("Failed to save item")
+        raise HTTPException(status_code=500, detail="Failed to save item")
 
 
-@app.get("/items")
-def get_items(db: sqlite3.Connection = Depends(get_db)):
+# add_items_bulk is a handler to add several items at once for POST /items/bulk .
+# The items refer to images that have already been uploaded.
+@app.post("/items/bulk", responses={200: {"model": AddItemResponse}})
+def add_items_bulk(items: list[Item], db: sqlite3.Connection = Depends(get_write_db)):
+    for item in items:
+        if not item.name or not item.category:
+            raise HTTPException(status_code=400, detail="name and category are required")
+        # The image must already have been stored by POST /items or PATCH
+        if not STORED_IMAGE_NAME_RE.fullmatch(item.image_name) or not os.path.exists(
+            os.path.join(IMAGES_DIR, item.image_name)
+        ):
+            raise HTTPException(status_code=400, detail=f"Unknown image: {item.image_name}")
+
+    category_names = list({item.category: None for item in items})
     try:
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT items.id, items.name, categories.name AS category_name, items.image_name
-            FROM items
-            JOIN categories ON items.category_id = categories.id
-        """)
-        items = cursor.fetchall()
+        with write_transaction(db):
+            db.executemany(SQL_INSERT_CATEGORY, [(name,) for name in category_names])
+            resolved_ids = dict(db.execute(SQL_GET_CATEGORY_IDS, (orjson.dumps(category_names).decode(),)).fetchall())
+            db.executemany(
+                SQL_INSERT_ITEM,
+                [(item.name, resolved_ids[item.category], item.image_name) for item in items],
+            )
+        category_ids.update(resolved_ids)
+        logger.info("%d items inserted", len(items))
+
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=400, detail="Item already exists")
 
-        return {"items": [dict(row) for row in items]}
-    except Exception as e:
-        logger.error(f"Failed to get items: {e}")
-        raise HTTPException(status_code=500, detail="Failed to get items")
+    except sqlite3.Error:
+        logger.exception("Failed to save items")
+        raise HTTPException(status_code=500, detail="Failed to save items")
+
+    invalidate_item_caches()
+    return {"message": f"items received: {len(items)}"}
+
+
+@app.get("/items")
+def get_items(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: sqlite3.Connection = Depends(get_db),
+):
+    # Only the complete list is cached
+    if limit is not None or offset:
+        return get_items_page(request, limit, offset, db)
+
+    global items_cache
+    check_items_version(db)
+    # Read the global once: another thread may invalidate it at any time
+    cached = items_cache
+    if cached is None:
+        generation = cache_generation
+        items = db.execute(SQL_GET_ITEMS).fetchall()
+
+        body = orjson.dumps({
+            "items": [
+                {"id": row[0], "name": row[1], "category_name": row[2], "image_name": row[3]}
+                for row in items
+            ]
+        })
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        with cache_lock:
+            if generation == cache_generation:
+                items_cache = (body, etag)
+    else:
+        body, etag = cached
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def get_items_page(request: Request, limit: Optional[int], offset: int, db: sqlite3.Connection) -> Response:
+    # One extra row tells whether there is a next page; LIMIT -1 is no limit
+    rows = db.execute(SQL_GET_ITEMS_PAGE, (-1 if limit is None else limit + 1, offset)).fetchall()
+    headers = {}
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_url = request.url.include_query_params(limit=limit, offset=offset + limit)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+
+    body = orjson.dumps({
+        "items": [
+            {"id": row[0], "name": row[1], "category_name": row[2], "image_name": row[3]}
+            for row in rows
+        ]
+    })
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.get("/items/{item_id}")
 def get_item(item_id: int, db: sqlite3.Connection = Depends(get_db)):
-    try:
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT items.id, items.name, categories.name AS category_name, items.image_name
-            FROM items
-            JOIN categories ON items.category_id = categories.id
-            WHERE items.id = ?
-        """, (item_id,))
-        item = cursor.fetchone()
-
-        if item is None:
-            raise HTTPException(status_code=404, detail="Item not found")
+    check_items_version(db)
+    item = item_cache.get(item_id)
+    if item is not None:
+        return item
 
-        return dict(item)
-    except Exception as e:
-        logger.error(f"Failed to get item {item_id}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to get item")
+    generation = cache_generation
+    row = db.execute(SQL_GET_ITEM, (item_id,)).fetchone()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+
+    item = {"id": row[0], "name": row[1], "category_name": row[2], "image_name": row[3]}
+
+    with cache_lock:
+        if generation == cache_generation:
+            if len(item_cache) >= ITEM_CACHE_SIZE:
+                item_cache.pop(next(iter(item_cache)))
+            item_cache[item_id] = item
+    return item
 
 
 @app.get("/search")
 def search_items(keyword: str = Query(..., min_length=1), db: sqlite3.Connection = Depends(get_db)):
-    try:
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT items.name, categories.name AS category_name, items.image_name
-            FROM items
-            JOIN categories ON items.category_id = categories.id
-            WHERE items.name LIKE ? OR categories.name LIKE ?
-        """, (f"%{keyword}%", f"%{keyword}%"))
-        items = cursor.fetchall()
-
-        return {
-            "items": [
-                {"name": row["name"], "category": row["category_name"], "image_name": row["image_name"]}
-                for row in items
-            ]
-        }
-    except Exception as e:
-        logger.error(f"Failed to search items: {e}")
-        raise HTTPException(status_code=500, detail="Failed to search items")
+    if len(keyword) >= 3:
+        # Quote the keyword as an FTS5 string so it matches as a substring
+        query = '"' + keyword.replace('"', '""') + '"'
+        items = db.execute(SQL_SEARCH_ITEMS, (query,)).fetchall()
+    else:
+        pattern = f"%{keyword}%"
+        items = db.execute(SQL_SEARCH_ITEMS_SHORT, (pattern, pattern)).fetchall()
+
+    return {
+        "items": [
+            {"name": row[0], "category": row[1], "image_name": row[2]}
+            for row in items
+        ]
+    }
 
 
 @app.delete("/items/{item_id}")
-def delete_item(item_id: int, db: sqlite3.Connection = Depends(get_db)):
+def delete_item(item_id: int, db: sqlite3.Connection = Depends(get_write_db)):
     try:
-        cursor = db.cursor()
-        cursor.execute("SELECT image_name FROM items WHERE id = ?", (item_id,))
-        item = cursor.fetchone()
+        with write_transaction(db):
+            item = db.execute(SQL_GET_IMAGE_NAME, (item_id,)).fetchone()
 
-        if item is None:
-            raise HTTPException(status_code=404, detail="Item not found")
-
-        image_name = item["image_name"]
-        image_path = images / image_name
+            if item is None:
+                raise HTTPException(status_code=404, detail="Item not found")
 
-        cursor.execute("DELETE FROM items WHERE id = ?", (item_id,))
-        db.commit()
+            db.execute(SQL_DELETE_ITEM, (item_id,))
+        invalidate_item_caches()
 
-        cursor.execute("SELECT COUNT(*) FROM items WHERE image_name = ?", (image_name,))
-        count = cursor.fetchone()[0]
-        
-        if count == 0 and image_path.exists():
-            os.remove(image_path)
+        remove_unreferenced_image(db, item[0])
 
         return {"message": f"Item {item_id} deleted successfully"}
 
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to delete item {item_id}: {e}")
+    except sqlite3.Error:
+        logger.exception("Failed to delete item %s", item_id)
         raise HTTPException(status_code=500, detail="Failed to delete item")
 
 
-@app.patch("/items/{item_id}")
-async def update_item(
+def apply_item_update(
+    db: sqlite3.Connection,
     item_id: int,
-    name: Optional[str] = Form(None),
-    category: Optional[str] = Form(None),
-    image: Optional[UploadFile] = File(None),
-    db: sqlite3.Connection = Depends(get_db)
-):
-    try:
-        cursor = db.cursor()
-
-        cursor.execute("""
-            SELECT items.id, items.name, categories.name AS category_name, items.image_name
-            FROM items
-            JOIN categories ON items.category_id = categories.id
-            WHERE items.id = ?
-        """, (item_id,))
-        existing_item = cursor.fetchone()
-
+    name: Optional[str],
+    category: Optional[str],
+    image_filename: Optional[str],
+) -> bool:
+    # The row is read inside the write transaction, so the comparison and the
+    # image to clean up reflect any update or delete that committed meanwhile
+    with write_transaction(db):
+        existing_item = db.execute(SQL_GET_ITEM, (item_id,)).fetchone()
         if existing_item is None:
             raise HTTPException(status_code=404, detail="Item not found")
 
+        _, old_name, old_category, old_image_name = existing_item
         update_fields = []
         update_values = []
 
-        if name and name != existing_item["name"]:
+        if name and name != old_name:
             update_fields.append("name = ?")
             update_values.append(name)
 
-        if category and category != existing_item["category_name"]:
-            cursor.execute("SELECT id FROM categories WHERE name = ?", (category,))
-            category_row = cursor.fetchone()
+        if image_filename and image_filename != old_image_name:
+            update_fields.append("image_name = ?")
+            update_values.append(image_filename)
 
-            if category_row is None:
-                cursor.execute("INSERT INTO categories (name) VALUES (?)", (category,))
-                db.commit()
-                category_id = cursor.lastrowid
-            else:
-                category_id = category_row["id"]
+        changes_category = bool(category) and category != old_category
+        if not update_fields and not changes_category:
+            return False
 
+        if changes_category:
+            category_id = get_category_id(db, category)
             update_fields.append("category_id = ?")
             update_values.append(category_id)
 
+        update_values.append(item_id)
+        update_query = f"UPDATE items SET {', '.join(update_fields)} WHERE id = ?"
+        db.execute(update_query, update_values)
+    if changes_category:
+        category_ids[category] = category_id
+    invalidate_item_caches()
+
+    # Remove the replaced image once no other item refers to it
+    if "image_name = ?" in update_fields:
+        remove_unreferenced_image(db, old_image_name)
+
+    return True
+
+
+@app.patch("/items/{item_id}")
+async def update_item(
+    item_id: int,
+    name: Optional[str] = Form(None),
+    category: Optional[str] = Form(None),
+    image: Optional[UploadFile] = File(None),
+):
+    try:
+        # Don't store an upload for an item that does not exist;
+        # apply_item_update checks again under the write lock
+        async with pooled_connection(read_pool) as db:
+            if db.execute(SQL_GET_ITEM, (item_id,)).fetchone() is None:
+                raise HTTPException(status_code=404, detail="Item not found")
+
+        image_filename = None
         if image:
-            if not image.filename.lower().endswith((".jpg", ".jpeg")):
+            if os.path.splitext(image.filename)[1].lower() not in JPG_EXTENSIONS:
                 raise HTTPException(status_code=400, detail="Uploaded file must have a .jpg or .jpeg extension")
 
-            image_bytes = await image.read()
-            if len(image_bytes) > MAX_FILE_SIZE:
-                raise HTTPException(status_code=400, detail="File size exceeds the limit")
-
-            image_hash = hashlib.sha256(image_bytes).hexdigest()
-            image_filename = f"{image_hash}.jpg"
-            image_path = images / image_filename
-
-            if image_filename != existing_item["image_name"]:
-                with open(image_path, "wb") as f:
-                    f.write(image_bytes)
-
-                if not image_path.exists():
-                    logger.error(f"Failed to save image: {image_path}")
-                    raise HTTPException(status_code=500, detail="Failed to save image")
-                else:
-                    logger.info(f"New image saved: {image_path}")
-
-                    old_image_path = images / existing_item["image_name"]
-                    if old_image_path.exists():
-                        old_image_path.unlink()
-
-                update_fields.append("image_name = ?")
-                update_values.append(image_filename)
-                
-            elif image_filename == existing_item["image_name"] and not image_path.exists():
-                with open(image_path, "wb") as f:
-                    f.write(image_bytes)
-
-                if not image_path.exists():
-                    logger.error(f"Failed to save image: {image_path}")
-                    raise HTTPException(status_code=500, detail="Failed to save image")
-                else:
-                    logger.info(f"New image saved: {image_path}")
-                    update_fields.append("image_name = ?")
-                    update_values.append(image_filename)
-        
-            else:
-                logger.info(f"Image already exists: {image_path}")
-
-        if not update_fields:
-            return {"message": "No changes detected, item not updated"}
+            image_filename = await save_image(image)
 
-        update_values.append(item_id)
-        update_query = f"UPDATE items SET {', '.join(update_fields)} WHERE id = ?"
-        cursor.execute(update_query, update_values)
-        db.commit()
+        # The update commits (and fsyncs), so keep it off the event loop. As in
+        # add_item, the write connection is not held while the upload is saved
+        async with pooled_connection(write_pool) as db:
+            updated = await run_in_threadpool(
+                apply_item_update, db, item_id, name, category, image_filename
+            )
+        if not updated:
+            return {"message": "No changes detected, item not updated"}
 
         return {"message": "Item updated successfully"}
-    
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to update item {item_id}: {e}")
+
+    except sqlite3.IntegrityError:
+        # The new name belongs to another item (UNIQUE index on items.name)
+        raise HTTPException(status_code=400, detail="Item already exists")
+
+    except sqlite3.Error:
+        logger.exception("Failed to update item %s", item_id)
         raise HTTPException(status_code=500, detail="Failed to update item")
@@ -1,6 +1,9 @@
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
-from main import app, get_db
+import main
+from main import app, setup_database, remove_stale_uploads, write_transaction, apply_item_update, invalidate_item_caches, category_ids, images, SQL_DB, open_pool, close_pool
 import pytest
+import hashlib
 import sqlite3
 import os
 import pathlib
@@ -8,41 +11,26 @@ import pathlib
 # STEP 6-4: uncomment this test setup
 test_db = pathlib.Path(__file__).parent.resolve() / "db" / "test_mercari.sqlite3"
 
-def override_get_db():
-    conn = sqlite3.connect(test_db, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
-
-app.dependency_overrides[get_db] = override_get_db
-
 @pytest.fixture(autouse=True)
-def db_connection():
+def db_connection(monkeypatch):
     # Before the test is done, create a test database
     conn = sqlite3.connect(test_db)
-    cursor = conn.cursor()
-    cursor.execute(
-        """CREATE TABLE IF NOT EXISTS categories (
-		id INTEGER PRIMARY KEY AUTOINCREMENT,
-		name TEXT UNIQUE NOT NULL
-	)"""
-    )
-    cursor.execute(
-        """CREATE TABLE IF NOT EXISTS items (
-		id INTEGER PRIMARY KEY AUTOINCREMENT,
-		name TEXT NOT NULL,
-		category_id INTEGER NOT NULL,
-        image_name TEXT NOT NULL,
-        FOREIGN KEY (category_id) REFERENCES categories (category_id)
-	)"""
-    )
+    with open(SQL_DB, "r", encoding="utf-8") as f:
+        conn.executescript(f.read())
     conn.commit()
     conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+    # Cached responses and ids belong to the previous test's database
+    invalidate_item_caches()
+    category_ids.clear()
+    # Handlers take their connections from the pools, as after app startup
+    monkeypatch.setattr(main, "db", test_db)
+    monkeypatch.setattr(main, "read_pool", open_pool(1))
+    monkeypatch.setattr(main, "write_pool", open_pool(1))
 
     yield conn
 
+    close_pool(main.read_pool)
+    close_pool(main.write_pool)
     conn.close()
     # After the test is done, remove the test database
     if test_db.exists():
@@ -101,3 +89,344 @@ def test_add_item_e2e(args,want_status_code,db_connection):
     cursor.execute("SELECT id FROM categories WHERE name = ?", (args["category"],))
     db_category_id = cursor.fetchone()[0]
     assert dict(db_item)["category_id"] == db_category_id
+
+
+def test_add_item_duplicate_name(db_connection):
+    args = {"name": "used iPhone 16e", "category": "phone"}
+    with open("python/images/default.jpg", "rb") as f:
+        files = {"image": ("default.jpg", f.read(), "image/jpeg")}
+
+    response = client.post("/items/", data=args, files=files)
+    assert response.status_code == 200
+
+    response = client.post("/items/", data=args, files=files)
+    assert response.status_code == 400
+
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM items WHERE name = ?", (args["name"],))
+    assert cursor.fetchone()[0] == 1
+
+
+def test_update_item_duplicate_name(db_connection):
+    with open("python/images/default.jpg", "rb") as f:
+        files = {"image": ("default.jpg", f.read(), "image/jpeg")}
+    for name in ("jacket", "coat"):
+        response = client.post("/items/", data={"name": name, "category": "fashion"}, files=files)
+        assert response.status_code == 200
+
+    response = client.patch("/items/2", data={"name": "jacket"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Item already exists"}
+    assert client.get("/items/2").json()["name"] == "coat"
+
+
+def test_setup_database_duplicate_names(monkeypatch, tmp_path):
+    # A database written before items.name was UNIQUE
+    legacy_db = tmp_path / "legacy.sqlite3"
+    conn = sqlite3.connect(legacy_db)
+    conn.executescript("""
+        CREATE TABLE categories (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL);
+        CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, category_id INTEGER NOT NULL, image_name TEXT NOT NULL);
+        INSERT INTO categories (name) VALUES ('fashion');
+        INSERT INTO items (name, category_id, image_name) VALUES ('jacket', 1, 'a.jpg'), ('jacket', 1, 'b.jpg');
+    """)
+    conn.close()
+    monkeypatch.setattr(main, "db", legacy_db)
+
+    with pytest.raises(RuntimeError, match=r"'jacket' \(ids 1, 2\)"):
+        setup_database()
+
+
+def test_write_transaction_failed_commit():
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+    conn.execute("CREATE TABLE child (parent_id INTEGER REFERENCES parent(id) DEFERRABLE INITIALLY DEFERRED)")
+
+    # A deferred foreign key violation makes COMMIT itself fail
+    with pytest.raises(sqlite3.IntegrityError):
+        with write_transaction(conn):
+            conn.execute("INSERT INTO child VALUES (1)")
+    assert not conn.in_transaction
+
+    with write_transaction(conn):
+        conn.execute("INSERT INTO parent VALUES (1)")
+    conn.close()
+
+
+def test_get_items_etag(db_connection):
+    response = client.get("/items")
+    assert response.status_code == 200
+    assert response.json() == {"items": []}
+    etag = response.headers["etag"]
+
+    response = client.get("/items", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    response = client.get("/items", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+
+    with open("python/images/default.jpg", "rb") as f:
+        files = {"image": ("default.jpg", f.read(), "image/jpeg")}
+    response = client.post("/items/", data={"name": "jacket", "category": "fashion"}, files=files)
+    assert response.status_code == 200
+
+    # Adding an item invalidates the cached list
+    response = client.get("/items", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [item["name"] for item in response.json()["items"]] == ["jacket"]
+
+
+def test_get_items_page(db_connection):
+    db_connection.execute("INSERT INTO categories (name) VALUES ('fashion')")
+    db_connection.executemany(
+        "INSERT INTO items (name, category_id, image_name) VALUES (?, 1, 'default.jpg')",
+        [(f"item{i}",) for i in range(5)],
+    )
+    db_connection.commit()
+
+    response = client.get("/items", params={"limit": 2, "offset": 2})
+    assert response.status_code == 200
+    assert [item["name"] for item in response.json()["items"]] == ["item2", "item3"]
+    assert response.links["next"]["url"].endswith("/items?limit=2&offset=4")
+
+    response = client.get("/items", params={"limit": 2, "offset": 4})
+    assert [item["name"] for item in response.json()["items"]] == ["item4"]
+    assert "link" not in response.headers
+
+    response = client.get("/items", params={"offset": 3})
+    assert [item["name"] for item in response.json()["items"]] == ["item3", "item4"]
+    assert "link" not in response.headers
+
+
+def test_get_items_sees_other_writers(db_connection):
+    response = client.get("/items")
+    assert response.json() == {"items": []}
+
+    # A write made outside this process (e.g. by another worker) must not be
+    # hidden by the cached response
+    db_connection.execute("INSERT INTO categories (name) VALUES ('fashion')")
+    db_connection.execute("INSERT INTO items (name, category_id, image_name) VALUES ('jacket', 1, 'default.jpg')")
+    db_connection.commit()
+
+    response = client.get("/items")
+    assert [item["name"] for item in response.json()["items"]] == ["jacket"]
+    response = client.get("/items/1")
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "keyword, want_names",
+    [
+        ("iPhone", ["used iPhone 16e"]),
+        ("PHONE", ["used iPhone 16e", "Pixel 9"]),
+        ("16", ["used iPhone 16e"]),
+        ('"e', []),
+        ("jacket", []),
+    ],
+)
+def test_search_items(keyword, want_names, db_connection):
+    with open("python/images/default.jpg", "rb") as f:
+        files = {"image": ("default.jpg", f.read(), "image/jpeg")}
+    for args in ({"name": "used iPhone 16e", "category": "phone"}, {"name": "Pixel 9", "category": "phone"}):
+        response = client.post("/items/", data=args, files=files)
+        assert response.status_code == 200
+
+    response = client.get("/search", params={"keyword": keyword})
+    assert response.status_code == 200
+    assert [item["name"] for item in response.json()["items"]] == want_names
+
+
+@pytest.fixture
+def stored_image_name():
+    # The name under which POST /items stores default.jpg, with the file in place
+    image_bytes = (images / "default.jpg").read_bytes()
+    image_name = f"{hashlib.sha256(image_bytes).hexdigest()}.jpg"
+    if not (images / image_name).exists():
+        (images / image_name).write_bytes(image_bytes)
+    return image_name
+
+
+# Stands for stored_image_name in the parameters below
+STORED = "<stored image>"
+
+
+@pytest.mark.parametrize(
+    "items, want_status_code, want_count",
+    [
+        (
+            [
+                {"name": "used iPhone 16e", "category": "phone", "image_name": STORED},
+                {"name": "Pixel 9", "category": "phone", "image_name": STORED},
+                {"name": "jacket", "category": "fashion", "image_name": STORED},
+            ],
+            200,
+            3,
+        ),
+        (
+            [
+                {"name": "jacket", "category": "fashion", "image_name": STORED},
+                {"name": "jacket", "category": "fashion", "image_name": STORED},
+            ],
+            400,
+            0,
+        ),
+        ([{"name": "", "category": "fashion", "image_name": STORED}], 400, 0),
+        ([{"name": "jacket", "category": "", "image_name": STORED}], 400, 0),
+        ([{"name": "jacket", "category": "fashion", "image_name": "default.jpg"}], 400, 0),
+        ([{"name": "jacket", "category": "fashion", "image_name": "../../victim.txt"}], 400, 0),
+        ([{"name": "jacket", "category": "fashion", "image_name": f"{'0' * 64}.jpg"}], 400, 0),
+    ],
+)
+def test_add_items_bulk(items, want_status_code, want_count, stored_image_name, db_connection):
+    # The items refer to an image that has already been uploaded
+    items = [
+        {**item, "image_name": stored_image_name} if item["image_name"] == STORED else item
+        for item in items
+    ]
+
+    response = client.post("/items/bulk", json=items)
+    assert response.status_code == want_status_code
+
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM items")
+    assert cursor.fetchone()[0] == want_count
+
+    if want_status_code >= 400:
+        return
+
+    response = client.get("/items")
+    assert [(item["name"], item["category_name"]) for item in response.json()["items"]] == [
+        (item["name"], item["category"]) for item in items
+    ]
+
+
+def test_delete_item_keeps_unstored_images(db_connection):
+    # Only <sha256>.jpg files are ever removed, whatever image_name says
+    db_connection.execute("INSERT INTO categories (name) VALUES ('fashion')")
+    db_connection.execute("INSERT INTO items (name, category_id, image_name) VALUES ('jacket', 1, 'default.jpg')")
+    db_connection.commit()
+
+    response = client.delete("/items/1")
+    assert response.status_code == 200
+    assert (images / "default.jpg").exists()
+
+
+def test_add_item_reuses_stored_image(db_connection):
+    with open("python/images/default.jpg", "rb") as f:
+        image_bytes = f.read()
+    image_path = images / f"{hashlib.sha256(image_bytes).hexdigest()}.jpg"
+
+    response = client.post("/items/", data={"name": "jacket", "category": "fashion"}, files={"image": ("a.jpg", image_bytes, "image/jpeg")})
+    assert response.status_code == 200
+    mtime = image_path.stat().st_mtime_ns
+
+    # The same content uploaded again is not rewritten
+    response = client.post("/items/", data={"name": "coat", "category": "fashion"}, files={"image": ("b.jpg", image_bytes, "image/jpeg")})
+    assert response.status_code == 200
+    assert image_path.stat().st_mtime_ns == mtime
+    assert list(images.glob(".upload-*")) == []
+
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT DISTINCT image_name FROM items")
+    assert [row[0] for row in cursor.fetchall()] == [image_path.name]
+
+
+@pytest.mark.parametrize(
+    "image_name, expected_status",
+    [
+        ("default.jpg", 200),
+        (f"{'0' * 64}.jpg", 200),
+        ("default.png", 400),
+        ("..jpg", 400),
+        (f"{'A' * 64}.jpg", 400),
+    ],
+)
+def test_get_image_name(image_name, expected_status):
+    response = client.get(f"/images/{image_name}")
+    assert response.status_code == expected_status
+
+
+def test_get_image_etag(stored_image_name):
+    image_hash = stored_image_name[:-len(".jpg")]
+
+    response = client.get(f"/images/{image_hash}.jpg")
+    assert response.status_code == 200
+    assert "immutable" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+    assert etag == f'"{image_hash}"'
+
+    response = client.get(f"/images/{image_hash}.jpg", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # default.jpg is not content-addressed, so it is neither immutable nor
+    # tagged with its name
+    response = client.get("/images/default.jpg")
+    assert response.status_code == 200
+    assert "immutable" not in response.headers["cache-control"]
+    assert response.headers["etag"] != '"default"'
+
+
+def test_get_image_accel_redirect(monkeypatch):
+    monkeypatch.setattr("main.IMAGE_ACCEL_REDIRECT", "/internal_images/")
+
+    response = client.get("/images/default.jpg")
+    assert response.status_code == 200
+    assert response.headers["x-accel-redirect"] == "/internal_images/default.jpg"
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.content == b""
+
+
+@pytest.mark.parametrize(
+    "method, path",
+    [
+        ("GET", "/items/1"),
+        ("DELETE", "/items/1"),
+        ("PATCH", "/items/1"),
+    ],
+)
+def test_item_not_found(method, path, db_connection):
+    response = client.request(method, path)
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Item not found"}
+
+
+def test_apply_item_update_deleted_item(db_connection):
+    # A PATCH that passed the first lookup must still see a delete that
+    # committed before its update ran
+    db_connection.execute("INSERT INTO categories (name) VALUES ('fashion')")
+    db_connection.execute("INSERT INTO items (name, category_id, image_name) VALUES ('jacket', 1, 'default.jpg')")
+    db_connection.execute("DELETE FROM items WHERE id = 1")
+    db_connection.commit()
+
+    conn = sqlite3.connect(test_db, isolation_level=None)
+    with pytest.raises(HTTPException) as exc_info:
+        apply_item_update(conn, 1, "coat", None, None)
+    assert exc_info.value.status_code == 404
+    assert not conn.in_transaction
+    conn.close()
+
+
+def test_remove_stale_uploads(monkeypatch):
+    stale = images / ".upload-stale"
+    stale.write_bytes(b"")
+    os.utime(stale, (0, 0))
+    fresh = images / ".upload-fresh"
+    fresh.write_bytes(b"")
+
+    # Another worker's sweep removes the stale file just before this one does
+    real_remove = os.remove
+    def remove_after_other_worker(path):
+        real_remove(path)
+        real_remove(path)
+
+    try:
+        with monkeypatch.context() as m:
+            m.setattr(os, "remove", remove_after_other_worker)
+            remove_stale_uploads()
+        assert not stale.exists()
+        # Uploads younger than STALE_UPLOAD_AGE may still be in flight
+        assert fresh.exists()
+    finally:
+        fresh.unlink()
@@ -0,0 +1,7 @@
+from uvicorn_worker import UvicornWorker
+
+
+class UvloopWorker(UvicornWorker):
+    # uvloop and httptools are required rather than auto-detected, so a
+    # missing package stops the worker instead of falling back to asyncio/h11
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "loop": "uvloop", "http": "httptools"}